@@ -7,9 +7,37 @@ from pandas import DataFrame, to_datetime, read_csv
 from pydst import utils
 from pydst import validators
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.request import ACCEPT_ENCODING
+from urllib3.util.retry import Retry
 from collections import OrderedDict
-from io import StringIO
+from copy import deepcopy
+from datetime import timedelta
+from concurrent.futures import ThreadPoolExecutor
 import os
+import random
+import shutil
+import threading
+
+# Size of the connection pool per host, which also bounds get_data_many
+_POOL_MAXSIZE = 16
+# Number of JSON responses cached per Dst instance
+_JSON_CACHE_SIZE = 256
+# Longest wait in seconds between two attempts of a request
+_RETRY_WAIT_MAX = 30
+
+class _Retry(Retry):
+    """Retry with jittered exponential backoff and waits capped at
+    _RETRY_WAIT_MAX seconds, also when the server sends Retry-After.
+    """
+
+    def get_backoff_time(self):
+        backoff = super(_Retry, self).get_backoff_time()
+        return min(_RETRY_WAIT_MAX, backoff * (1 + random.random()))
+
+    def parse_retry_after(self, retry_after):
+        seconds = super(_Retry, self).parse_retry_after(retry_after)
+        return min(_RETRY_WAIT_MAX, seconds)
 
 class Dst(object):
     """Retrieve subjects, metadata and data from Statistics Denmark.
@@ -20,12 +48,113 @@ class Dst(object):
     Attributes:
         lang (str): Can take the values ``en`` for English or ``da``
             for Danish
+
+        session (requests.Session): Session shared by all requests such
+            that connections to Statistics Denmark are reused. Use
+            ``close`` or a ``with`` block to release the connections.
+
+        cache (bool): If True subjects, tables and table information are
+            also cached on disk for 24 hours in ``pydst_cache.sqlite`` using
+            ``requests-cache``, such that they survive between runs. Data
+            from ``get_data`` and ``get_csv`` is never cached.
     """
 
-    def __init__(self, lang='en'):
+    def __init__(self, lang='en', cache=False):
         self.lang = utils.check_lang(lang)
         self.base_url = 'https://api.statbank.dk'
         self.version = 'v1'
+        self.cache = cache
+        if cache:
+            try:
+                import requests_cache
+            except ImportError:
+                raise ImportError('cache=True requires requests-cache. '
+                                  'Install it with pip install requests-cache')
+            # The first matching pattern applies, so everything but the
+            # JSON endpoints, i.e. the streamed BULK data, bypasses the cache
+            expire_after = timedelta(hours=24)
+            self.session = requests_cache.CachedSession(
+                cache_name='pydst_cache',
+                backend='sqlite',
+                urls_expire_after=OrderedDict([
+                    ('*/subjects', expire_after),
+                    ('*/tables', expire_after),
+                    ('*/tableinfo', expire_after),
+                    ('*', requests_cache.DO_NOT_CACHE),
+                    ]),
+                allowable_methods=('GET',))
+        else:
+            self.session = requests.Session()
+        self.session.headers.update({'Accept-Encoding': ACCEPT_ENCODING})
+        retries = _Retry(total=3,
+                         backoff_factor=1.0,
+                         status_forcelist=(429, 500, 502, 503, 504),
+                         allowed_methods=frozenset(['GET']),
+                         respect_retry_after_header=True,
+                         raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=4,
+                              pool_maxsize=_POOL_MAXSIZE,
+                              max_retries=retries)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self._json_cache = OrderedDict()
+        self._json_cache_lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """Closes the underlying session and releases pooled connections."""
+        self.session.close()
+
+    def clear_cache(self):
+        """Clears the cached subjects, tables and table information, including
+        the cache on disk if the instance was created with ``cache=True``.
+        """
+        with self._json_cache_lock:
+            self._json_cache.clear()
+        if self.cache:
+            self.session.cache.clear()
+
+    def _get_json(self, url):
+        """Returns the parsed JSON response from `url`
+
+        The result is cached per instance for the _JSON_CACHE_SIZE most
+        recently used urls, so the returned object must not be mutated.
+        Public methods copy the parts they hand out.
+        """
+        with self._json_cache_lock:
+            if url in self._json_cache:
+                self._json_cache.move_to_end(url)
+                return self._json_cache[url]
+
+        r = self.session.get(url)
+        utils.bad_request_wrapper(r)
+        json = r.json()
+
+        with self._json_cache_lock:
+            self._json_cache[url] = json
+            if len(self._json_cache) > _JSON_CACHE_SIZE:
+                self._json_cache.popitem(last=False)
+        return json
+
+    def _get_tableinfo(self, table_id, lang):
+        """Returns the parsed tableinfo response for `table_id`"""
+        query_dict = {
+            'lang': lang,
+            'format': 'JSON'
+            }
+
+        url = utils.construct_url(self.base_url,
+                                  self.version,
+                                  'tableinfo',
+                                  table_id,
+                                  query_dict)
+
+        return self._get_json(url)
 
     def get_subjects(self, subjects=None, lang=None):
         """Retrieve subjects and sub subjects from Statistics Denmark.
@@ -69,7 +198,9 @@ class Dst(object):
         if not isinstance(subjects, (str, list, type(None))):
             raise ValueError('Subjects must be a list or a string of subject ids')
 
-        if isinstance(subjects, (str, list)):
+        if isinstance(subjects, list):
+            validators.subject_validator_many(subjects)
+        elif isinstance(subjects, str):
             validators.subject_validator(subjects)
 
         query_dict = {
@@ -88,10 +219,7 @@ class Dst(object):
                                   str_subjects or '',
                                   query_dict)
 
-        r = requests.get(url)
-        utils.bad_request_wrapper(r)
-
-        return utils.desc_to_df(r.json())
+        return utils.desc_to_df(self._get_json(url))
 
     def get_tables(self, subjects=None, inactive_tables=False, lang=None):
         """
@@ -112,7 +240,7 @@ class Dst(object):
             pandas.DataFrame: Returns a DataFrame with subjects.
 
         Todo:
-            * Check inactive_tables (cerberus validator)
+            * Check inactive_tables (validator)
 
         Examples:
             The example beneath shows how ``get_tables`` is used.
@@ -151,11 +279,13 @@ class Dst(object):
         if not isinstance(subjects, (str, list, type(None))):
             raise ValueError('Subjects must be a list or a string of subject ids')
 
-        if isinstance(subjects, (str, list)):
+        if isinstance(subjects, list):
+            validators.subject_validator_many(subjects)
+        elif isinstance(subjects, str):
             validators.subject_validator(subjects)
 
         if not isinstance(inactive_tables, bool):
-            raise ValueError('Must be boolean') # replace with cerberus validator
+            raise ValueError('Must be boolean') # replace with validator
 
 
         query_dict = {
@@ -174,10 +304,7 @@ class Dst(object):
                                   '',
                                   query_dict)
 
-        r = requests.get(url)
-        utils.bad_request_wrapper(r)
-
-        res = DataFrame(r.json())
+        res = DataFrame(deepcopy(self._get_json(url)))
         res['updated'] = to_datetime(res['updated'])
         return res
 
@@ -197,24 +324,11 @@ class Dst(object):
 
         Todo:
             * Implement tests
-            * TableID cerberus validator
+            * TableID validator
         """
         lang = utils.assign_lang(self, lang)
-
-        query_dict = {
-            'lang': lang,
-            'format': 'JSON'
-            }
-
-        url = utils.construct_url(self.base_url,
-                                  self.version,
-                                  'tableinfo',
-                                  table_id,
-                                  query_dict)
-
-        r = requests.get(url)
-        utils.bad_request_wrapper(r)
-        return DataFrame(r.json()['variables'])
+        variables = self._get_tableinfo(table_id, lang)['variables']
+        return DataFrame(deepcopy(variables))
 
     def get_metadata(self, table_id, lang=None):
         """ DataFrame with metadata about `table_id`
@@ -235,23 +349,8 @@ class Dst(object):
             * Implement tests
         """
         lang = utils.assign_lang(self, lang)
-
-        query_dict = {
-            'lang': lang,
-            'format': 'JSON'
-            }
-
-        url = utils.construct_url(self.base_url,
-                                  self.version,
-                                  'tableinfo',
-                                  table_id,
-                                  query_dict)
-
-        r = requests.get(url)
-        utils.bad_request_wrapper(r)
-        json = r.json()
-        json.pop('variables', None)
-        return json
+        json = self._get_tableinfo(table_id, lang)
+        return deepcopy({k: v for k, v in json.items() if k != 'variables'})
 
     def get_data(self, table_id, variables=None, lang=None):
         """ DataFrame with variables contained in `table_id`
@@ -280,25 +379,82 @@ class Dst(object):
         """
         lang = utils.assign_lang(self, lang)
 
-        vars = self.get_variables(table_id, lang).iterrows()
+        if not isinstance(variables, (dict, type(None))):
+            raise ValueError("Variables must be either type None or Dict")
+
+        args = {var['id']: [var['values'][0]['id']] for var \
+                in self._get_tableinfo(table_id, lang)['variables']}
+        if variables:
+            args.update(variables)
+
+        query_dict = {
+            'lang': lang,
+            'delimiter': 'Semicolon'
+            }
+        query_dict.update(args)
+
+        url = utils.construct_url(self.base_url,
+                                  self.version,
+                                  'data',
+                                  table_id + '/BULK',
+                                  query_dict)
+        with self.session.get(url, stream=True) as r:
+            utils.bad_request_wrapper(r)
+            r.raw.decode_content = True
+            return read_csv(r.raw, sep=';', encoding='utf-8')
+
+    def get_data_many(self, table_ids, variables=None, lang=None,
+                      max_workers=10):
+        """ Dictionary of DataFrames with data from each of `table_ids`
+
+        The tables are retrieved concurrently using a pool of threads that
+        share the instance's session.
+
+        Args:
+            table_ids (list of str): Table IDs for the tables you want to
+                retrieve data from.
+
+            variables (dict, optional): Dictionary with table IDs as keys and
+                the ``variables`` argument passed to ``get_data`` for that
+                table as values. Tables not in the dictionary use the
+                default variables. Every key must be one of table_ids.
+
+            lang (str, optional): If lang is provided it uses this argument
+                instead of the Dst's class attribute lang. Can take the values
+                ``en`` for English or ``da`` for Danish
+
+            max_workers (int, optional): Maximum number of tables retrieved
+                at the same time. Capped at the size of the session's
+                connection pool, which is 16.
+
+        Returns:
+            dict: Returns a dictionary with table IDs as keys and
+                pandas.DataFrame as values.
+        """
+        lang = utils.assign_lang(self, lang)
+
+        table_ids = list(table_ids)
 
         if isinstance(variables, type(None)):
-            args = {row[1]['id']:[row[1]['values'][0]['id']] for row in vars}
-        elif isinstance(variables, dict):
-            args = {row[1]['id']:[row[1]['values'][0]['id']] for row \
-                    in vars if row[1]['id'] not in variables.keys()}
-            args = {**variables, **args}
-        else:
+            variables = {}
+        elif not isinstance(variables, dict):
             raise ValueError("Variables must be either type None or Dict")
 
-        base_url = 'http://api.statbank.dk/v1/data/{}/' \
-                    'BULK?lang={}&delimiter=Semicolon&{}'
-        arg_str = '&'.join([key + '=' + ','.join(value) \
-                            for key, value in args.items()])
-        url = base_url.format(table_id, lang, arg_str)
-        r = requests.get(url)
-        utils.bad_request_wrapper(r)
-        return read_csv(StringIO(r.content.decode('utf-8')), sep=';')
+        unknown = [key for key in variables if key not in table_ids]
+        if unknown:
+            raise ValueError('Variables must have table IDs as keys. '
+                             'Not in table_ids: {}'.format(
+                                 ', '.join(map(str, unknown))))
+
+        max_workers = min(max_workers, _POOL_MAXSIZE)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {table_id: executor.submit(self.get_data,
+                                                 table_id,
+                                                 variables.get(table_id),
+                                                 lang)
+                       for table_id in table_ids}
+            return {table_id: future.result() \
+                    for table_id, future in futures.items()}
 
     def get_csv(self, path, table_id, variables=None, lang=None):
         """ Save `table_id` as csv
@@ -333,25 +489,27 @@ class Dst(object):
         os.path.abspath(os.path.expanduser(path)))):
             raise OSError('Directory does not exist')
 
-        vars = self.get_variables(table_id, lang).iterrows()
-
-        if isinstance(variables, type(None)):
-            args = {row[1]['id']:[row[1]['values'][0]['id']] for row in vars}
-        elif isinstance(variables, dict):
-            args = {row[1]['id']:[row[1]['values'][0]['id']] for row \
-                    in vars if row[1]['id'] not in variables.keys()}
-            args = {**variables, **args}
-        else:
+        if not isinstance(variables, (dict, type(None))):
             raise ValueError("Variables must be either type None or Dict")
 
-        base_url = 'http://api.statbank.dk/v1/data/{}/' \
-                    'BULK?lang={}&delimiter=Semicolon&{}'
-        arg_str = '&'.join([key + '=' + ','.join(value) \
-                            for key, value in args.items()])
-        url = base_url.format(table_id, lang, arg_str)
-        r = requests.get(url, stream=True)
-        utils.bad_request_wrapper(r)
-        with open(os.path.abspath(os.path.expanduser(path)), 'wb') as f:
-            for line in r.iter_lines():
-                f.write(line)
-                f.write('\n'.encode())
+        args = {var['id']: [var['values'][0]['id']] for var \
+                in self._get_tableinfo(table_id, lang)['variables']}
+        if variables:
+            args.update(variables)
+
+        query_dict = {
+            'lang': lang,
+            'delimiter': 'Semicolon'
+            }
+        query_dict.update(args)
+
+        url = utils.construct_url(self.base_url,
+                                  self.version,
+                                  'data',
+                                  table_id + '/BULK',
+                                  query_dict)
+        with self.session.get(url, stream=True) as r:
+            utils.bad_request_wrapper(r)
+            r.raw.decode_content = True
+            with open(os.path.abspath(os.path.expanduser(path)), 'wb') as f:
+                shutil.copyfileobj(r.raw, f, 1024 * 1024)
@@ -1,6 +1,5 @@
 from pandas import DataFrame
-from pydst import validators
-import os
+from urllib.parse import urlencode
 
 def bad_request_wrapper(r):
     """Raises an error if http error
@@ -12,13 +11,20 @@ def bad_request_wrapper(r):
     Args:
         r (requests.models.Response): Response from the requests library.
     """
-    if not r.ok:
-        if r.json().get('errorTypeCode', None) and \
-           r.json().get('message', None):
-           r.reason = r.json()['message']
-           r.raise_for_status()
-        else:
-           r.raise_for_status()
+    if r.ok:
+        return
+
+    try:
+        body = r.json()
+    except ValueError:
+        body = {}
+
+    if isinstance(body, dict) and body.get('errorTypeCode', None) and \
+       body.get('message', None):
+        r.reason = body['message']
+    r.raise_for_status()
+
+_VALID_LANGS = frozenset(['da', 'en'])
 
 def check_lang(lang):
     """Returns lang if lang is an available languages
@@ -27,10 +33,16 @@ def check_lang(lang):
         lang (str): Can take the values ``en`` for English or ``da``
             for Danish
     """
-    validators.lang_validator(lang, ['da', 'en'])
+    if not isinstance(lang, str) or lang not in _VALID_LANGS:
+        raise ValueError('{} is not in {}'.format(lang, sorted(_VALID_LANGS)))
     return lang
 
 def assign_lang(self, lang=None):
+    """Returns lang if provided and otherwise the lang attribute of self
+
+    The lang attribute is public and can be changed after the Dst instance
+    is created, so it is checked as well.
+    """
     if lang:
         return check_lang(lang)
     else:
@@ -45,26 +57,44 @@ def desc_to_df(list_):
     Returns:
         pandas.DataFrame: Returns a DataFrame of the flatten response.
     """
-    def json_to_df_dict(list_):
-        res = []
-        for i in list_:
-            if not i['subjects']:
-                res.append({'id': i['id'], 'desc': i['description'], 'active': i['active'], 'hasSubjects': i['hasSubjects']})
-            else:
-                res.extend(json_to_df_dict(i['subjects']))
-        return res
-    return DataFrame(json_to_df_dict(list_))
+    ids, descs, actives, has_subjects = [], [], [], []
+    stack = list(reversed(list_))
+    while stack:
+        i = stack.pop()
+        if i['subjects']:
+            stack.extend(reversed(i['subjects']))
+        else:
+            ids.append(i['id'])
+            descs.append(i['description'])
+            actives.append(i['active'])
+            has_subjects.append(i['hasSubjects'])
+    return DataFrame({'id': ids,
+                      'desc': descs,
+                      'active': actives,
+                      'hasSubjects': has_subjects})
 
 def construct_url(base, version, app, path, query):
+    """Constructs an url to Statistics Denmark's API
+
+    Args:
+        base (str): Base url of the API.
+
+        version (str): Version of the API.
+
+        app (str): Endpoint of the API, e.g. ``tables``.
+
+        path (str): Path following the endpoint. Can be empty.
+
+        query (dict): Query parameters. Lists are comma seperated and
+            parameters with the value None are left out.
+
+    Returns:
+        str: The url with a percent-encoded query string.
     """
-    Todo:
-        * Test that url result expected url
-    """
-    url_without_query = ''.join([os.path.join(i, '') for i in \
-                                [base, version, app, path]])
+    url_without_query = '/'.join([i.strip('/') for i in \
+                                 [base, version, app, path] if i])
     query = flatten_list_to_string_in_dict_remove_none(query)
-    query_str = '&'.join(['{}={}'.format(k, v) for k, v in query.items()])
-    return url_without_query.replace("\\", "/").strip('/') + '?' + query_str
+    return url_without_query + '?' + urlencode(query, safe=',')
 
 def flatten_list_to_string_in_dict_remove_none(dict):
     return {k: (v if isinstance(v, str) else ','.join(v)) for k,v \
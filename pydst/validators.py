@@ -1,4 +1,13 @@
-import cerberus
+import re
+
+_ALPHA = re.compile(r'[A-Za-z]+')
+_DIGIT = re.compile(r'[0-9]+')
+
+_ARGUMENTS_ERROR = 'The following arguments is not provided correctly: %s. ' \
+                   'See the docs.'
+_SUBJECTS_ERROR = 'The following subjects is not provided correctly: %s. ' \
+                  'See the docs.'
+_NOT_IN_ERROR = '%s is not in %s'
 
 def lang_validator(lang, valid_langs):
     """Validates if language is correctly specified.
@@ -10,54 +19,44 @@ def lang_validator(lang, valid_langs):
         lang (str): Language that is contained in valid_langs.
             Language must be letters.
 
-        valid_langs(list of str): A list of valid languages. Each
-            element must be letters.
+        valid_langs(list/frozenset of str): The valid languages. Each
+            element must be letters. Pass a frozenset when validating
+            against the same languages repeatedly to get a hashed lookup.
 
     Returns:
         None
     """
-    v = cerberus.Validator()
-    schema = {
-        'lang': {
-            'type': 'string',
-            'regex': r'[a-zA-Z]+',
-        },
-        'valid_langs': {
-            'type': 'list',
-            'schema': {
-                'type': 'string',
-                'regex': r'[a-zA-Z]+',
-            }
-            }
-        }
-    validation_object = {
-        'lang': lang,
-        'valid_langs': valid_langs,
-        }
-
-    v.validate(validation_object, schema)
-
-    validation_error_raise(v)
-
-    if not str_in_list(lang, valid_langs):
-        raise ValueError('{} is not in {}'.format(lang, valid_langs))
-
-
-def str_in_list(str, list):
+    valid_langs_ok = isinstance(valid_langs, (list, frozenset)) and \
+        all(isinstance(i, str) and _ALPHA.fullmatch(i) for i in valid_langs)
+
+    # lang is letters if it is one of the validated valid_langs
+    if valid_langs_ok and isinstance(lang, str) and lang in valid_langs:
+        return
+
+    errors = {}
+    if not (isinstance(lang, str) and _ALPHA.fullmatch(lang)):
+        errors['lang'] = 'must be a string of letters'
+    if not valid_langs_ok:
+        errors['valid_langs'] = 'must be a list or frozenset of strings ' \
+                                'of letters'
+
+    validation_error_raise(errors)
+
+    raise ValueError(_NOT_IN_ERROR % (lang, valid_langs))
+
+
+def str_in_list(needle, haystack):
     """Check if a string is contained in a list
 
     Args:
-        str (str): Arbitrary string
+        needle (str): Arbitrary string
 
-        list (list of str): Arbitrary list of strings
+        haystack (list of str): Arbitrary list of strings
 
     Returns:
-        bool: Returns True (False) if (not) str contained in list
+        bool: Returns True (False) if (not) needle contained in haystack
     """
-    if str in list:
-        return True
-    else:
-        return False
+    return needle in haystack
 
 def dict_keys_to_comma_str(dict):
     """ Comma seperates dict keys into string
@@ -68,38 +67,52 @@ def dict_keys_to_comma_str(dict):
     Returns:
         str: Comma seperated string of keys.
     """
-    return ', '.join([str(i) for i in dict.keys()])
+    return ', '.join(map(str, dict))
 
-def validation_error_raise(validationObject):
-    if any(validationObject.errors):
-        raise ValueError(
-            'The following arguments is not provided correctly: {}. '\
-            'See the docs.'.format(dict_keys_to_comma_str(validationObject.errors))
-            )
+def validation_error_raise(errors):
+    """Raises a ValueError naming the arguments in errors
+
+    Args:
+        errors (dict): Dictionary with the names of the arguments that
+            failed validation as keys and a description as values.
+    """
+    if errors:
+        raise ValueError(_ARGUMENTS_ERROR % ', '.join(map(str, errors)))
 
 def subject_validator(subjects):
-    v = cerberus.Validator()
-    schema = {
-        'subjects': {
-            'anyof': [{
-                'type': 'string',
-                'regex': r'[0-9]+',
-            },
-            {
-                'type': 'list',
-                'schema': {
-                    'type': 'string',
-                    'regex': r'[0-9]+',
-                }
-            }
-
-            ]
-        }
-    }
-
-    validation_object = {
-        'subjects': subjects
-    }
-
-    v.validate(validation_object, schema)
-    validation_error_raise(v)
+    """Validates if subjects is correctly specified.
+
+    Args:
+        subjects (str/list of str): A subjectID or a list of subjectIDs.
+            Each subjectID must be digits.
+
+    Returns:
+        None
+    """
+    errors = {}
+    if isinstance(subjects, str):
+        valid = _DIGIT.fullmatch(subjects)
+    elif isinstance(subjects, list):
+        valid = all(isinstance(i, str) and _DIGIT.fullmatch(i) \
+                    for i in subjects)
+    else:
+        valid = False
+    if not valid:
+        errors['subjects'] = 'must be a string or a list of strings of digits'
+
+    validation_error_raise(errors)
+
+def subject_validator_many(subjects):
+    """Validates if every element of subjects is correctly specified.
+
+    Args:
+        subjects (iterable of str): SubjectIDs. Each subjectID must be
+            digits.
+
+    Returns:
+        None
+    """
+    invalid = [i for i in subjects \
+               if not (isinstance(i, str) and _DIGIT.fullmatch(i))]
+    if invalid:
+        raise ValueError(_SUBJECTS_ERROR % ', '.join(map(str, invalid)))
@@ -31,6 +31,7 @@ setup(
     ],
     description="Provides a simple API for retrieving data from Statistics Denmark",
     install_requires=requirements,
+    extras_require={'cache': ['requests-cache>=1.0']},
     license="MIT license",
     long_description=readme + '\n\n' + history,
     include_package_data=True,
@@ -3,12 +3,20 @@
 
 """Tests for `pydst` package."""
 
+import gzip
+import http.server
+import json
+import threading
+import time
+
 import pytest
+import requests
 
 from pandas import DataFrame
 from pydst import pydst
 from pydst import utils
 from collections import OrderedDict
+from urllib.parse import parse_qs, urlsplit
 
 # Check that utils.check_lang raises a value error if not 'da' or 'en'
 def test_nonexistence_lang_error():
@@ -34,6 +42,17 @@ def test_existence_lang_attribute():
 def test_existence_lang_attribute_default():
     assert 'en' == pydst.Dst().lang
 
+# Check that utils.assign_lang validates a lang attribute changed after init
+def test_assign_lang_checks_changed_attribute():
+    dst = pydst.Dst()
+    dst.lang = 'fr'
+    with pytest.raises(ValueError):
+        utils.assign_lang(dst)
+
+# Check that utils.assign_lang falls back to the lang attribute if lang is ''
+def test_assign_lang_empty_string_uses_attribute():
+    assert 'da' == utils.assign_lang(pydst.Dst('da'), '')
+
 # Check that Dst.get_subjects() returns a pandas.DataFrame
 def test_subjects_returns_df():
     assert isinstance(pydst.Dst().get_subjects(), DataFrame)
@@ -115,4 +134,280 @@ def test_inactive_tables_if_true():
 # test that calling pydst.Dst().get_tables with specified subjects only returns 
 # a subset of the full tables list
 def test_get_tables_can_filter():
-    assert pydst.Dst().get_tables(subjects = ['02']).shape != pydst.Dst().get_tables().shape
\ No newline at end of file
+    assert pydst.Dst().get_tables(subjects = ['02']).shape != pydst.Dst().get_tables().shape
+
+# Check that Dst can be used as a context manager that closes its session
+def test_dst_context_manager(monkeypatch):
+    closed = []
+    with pydst.Dst() as dst:
+        assert isinstance(dst, pydst.Dst)
+        monkeypatch.setattr(dst.session, 'close', lambda: closed.append(True))
+        assert not closed
+    assert closed == [True]
+
+# Check that utils.desc_to_df only keeps leaf subjects in their original order
+def test_desc_to_df_flattens_leaves_in_order():
+    def subject(id, subjects=()):
+        return {'id': id, 'description': id, 'active': True,
+                'hasSubjects': bool(subjects), 'subjects': list(subjects)}
+    res = utils.desc_to_df([subject('1', [subject('11'), subject('12')]),
+                            subject('2')])
+    assert list(res['id']) == ['11', '12', '2']
+
+# Check that utils.bad_request_wrapper raises an HTTPError for non-JSON errors
+def test_bad_request_wrapper_non_json_body():
+    r = requests.models.Response()
+    r.status_code = 500
+    r._content = b'<html>Internal Server Error</html>'
+    with pytest.raises(requests.exceptions.HTTPError):
+        utils.bad_request_wrapper(r)
+
+# Check that utils.construct_url joins the path and encodes the query
+def test_construct_url():
+    url = utils.construct_url('https://api.statbank.dk', 'v1', 'data',
+                              'FOLK1A/BULK',
+                              {'lang': 'en', 'OMRÅDE': ['000', '101'],
+                               'includeInactive': None})
+    parts = urlsplit(url)
+    assert parts.netloc + parts.path == 'api.statbank.dk/v1/data/FOLK1A/BULK'
+    assert parse_qs(parts.query) == {'lang': ['en'], 'OMRÅDE': ['000,101']}
+    assert 'OMR%C3%85DE=000,101' in parts.query
+
+# Check that utils.construct_url leaves out an empty path
+def test_construct_url_empty_path():
+    url = utils.construct_url('https://api.statbank.dk', 'v1', 'tables', '',
+                              {'lang': 'en', 'format': 'JSON'})
+    parts = urlsplit(url)
+    assert parts.netloc + parts.path == 'api.statbank.dk/v1/tables'
+    assert parse_qs(parts.query) == {'lang': ['en'], 'format': ['JSON']}
+
+# Check that get_data_many returns a dict keyed by table id and passes on the
+# variables for each table
+def test_get_data_many_returns_dict():
+    dst = pydst.Dst()
+    dst.get_data = lambda table_id, variables, lang: (variables, lang)
+    res = dst.get_data_many(['FOLK1A', 'FOLK1B'],
+                            variables={'FOLK1A': {'Tid': ['2018K1']}})
+    assert res == {'FOLK1A': ({'Tid': ['2018K1']}, 'en'),
+                   'FOLK1B': (None, 'en')}
+
+# Check that get_data_many rejects variables not keyed by table id
+def test_get_data_many_rejects_unknown_table_in_variables():
+    with pytest.raises(ValueError):
+        pydst.Dst().get_data_many(['FOLK1A'], variables={'Tid': ['2018K1']})
+
+# Check that get_data_many raises the error from a failing table
+def test_get_data_many_propagates_errors():
+    def get_data(table_id, variables, lang):
+        if table_id == 'FOLK1B':
+            raise requests.exceptions.HTTPError('FOLK1B failed')
+        return table_id
+
+    dst = pydst.Dst()
+    dst.get_data = get_data
+    with pytest.raises(requests.exceptions.HTTPError):
+        dst.get_data_many(['FOLK1A', 'FOLK1B'])
+
+# Check that get_data_many uses no more threads than pooled connections
+def test_get_data_many_caps_max_workers(monkeypatch):
+    workers = []
+    thread_pool_executor = pydst.ThreadPoolExecutor
+
+    def executor(max_workers):
+        workers.append(max_workers)
+        return thread_pool_executor(max_workers=max_workers)
+
+    monkeypatch.setattr(pydst, 'ThreadPoolExecutor', executor)
+    dst = pydst.Dst()
+    dst.get_data = lambda table_id, variables, lang: table_id
+    dst.get_data_many(['FOLK1A'], max_workers=100)
+    assert workers == [pydst._POOL_MAXSIZE]
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    """Answers each GET with the route matching its path or otherwise the
+    next queued (status, headers, body)
+    """
+    def do_GET(self):
+        self.server.paths.append(self.path)
+        for prefix, response in self.server.routes.items():
+            if self.path.startswith(prefix):
+                break
+        else:
+            response = self.server.responses.pop(0)
+        status, headers, body = response
+        self.send_response(status)
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+# Local server standing in for Statistics Denmark's API
+@pytest.fixture
+def server():
+    srv = http.server.HTTPServer(('127.0.0.1', 0), _Handler)
+    srv.responses = []
+    srv.routes = {}
+    srv.paths = []
+    thread = threading.Thread(target=srv.serve_forever, daemon=True)
+    thread.start()
+    yield srv
+    srv.shutdown()
+    srv.server_close()
+
+def _local_dst(server, **kwargs):
+    dst = pydst.Dst(**kwargs)
+    dst.base_url = 'http://127.0.0.1:{}'.format(server.server_port)
+    # Retry without sleeping between attempts
+    dst.session.get_adapter(dst.base_url).max_retries.backoff_factor = 0
+    return dst
+
+def _json_response(obj, status=200, headers=None):
+    return status, dict(headers or {}, **{'Content-Type': 'application/json'}), \
+        json.dumps(obj).encode()
+
+_SUBJECTS = [{'id': '02', 'description': 'Population', 'active': True,
+              'hasSubjects': False, 'subjects': []}]
+
+_UNAVAILABLE = _json_response({'errorTypeCode': 'ServiceUnavailable',
+                               'message': 'Statbank is down'},
+                              status=503, headers={'Retry-After': '0'})
+
+# Check that a transient 503 is retried and the following 200 is returned
+def test_retry_transient_error(server):
+    server.responses = [_UNAVAILABLE, _json_response(_SUBJECTS)]
+    res = _local_dst(server).get_subjects()
+    assert list(res['id']) == ['02']
+    assert len(server.paths) == 2
+
+# Check that the statbank message is raised once the retries are exhausted
+def test_retry_exhausted_raises_statbank_message(server):
+    server.responses = [_UNAVAILABLE] * 4
+    with pytest.raises(requests.exceptions.HTTPError) as excinfo:
+        _local_dst(server).get_subjects()
+    assert 'Statbank is down' in str(excinfo.value)
+    assert len(server.paths) == 4
+
+def _gzip_response(body, content_type):
+    return 200, {'Content-Type': content_type, 'Content-Encoding': 'gzip'}, \
+        gzip.compress(body)
+
+_TABLEINFO = {'id': 'FOLK1A',
+              'variables': [{'id': 'Tid', 'values': [{'id': '2018K1'}]}]}
+
+# Check that gzip-encoded BULK data is parsed with cache=True and never
+# written to the disk cache
+def test_cache_get_data_gzip(server, tmp_path, monkeypatch):
+    pytest.importorskip('requests_cache')
+    monkeypatch.chdir(str(tmp_path))
+    csv = _gzip_response('TID;INDHOLD\n2018K1;5781190\n'.encode('utf-8'),
+                         'text/csv')
+    server.responses = [_gzip_response(json.dumps(_TABLEINFO).encode(),
+                                       'application/json'),
+                        csv, csv]
+    with _local_dst(server, cache=True) as dst:
+        for _ in range(2):
+            res = dst.get_data('FOLK1A')
+            assert list(res['INDHOLD']) == [5781190]
+    assert len(server.paths) == 3
+
+# Check that subjects are served from the disk cache in a new Dst instance
+def test_cache_get_subjects_on_disk(server, tmp_path, monkeypatch):
+    pytest.importorskip('requests_cache')
+    monkeypatch.chdir(str(tmp_path))
+    server.responses = [_json_response(_SUBJECTS)]
+    for _ in range(2):
+        with _local_dst(server, cache=True) as dst:
+            assert list(dst.get_subjects()['id']) == ['02']
+    assert len(server.paths) == 1
+
+# Check that JSON responses are cached in memory until clear_cache is called
+def test_memory_cache_and_clear_cache(server):
+    server.responses = [_json_response(_SUBJECTS)] * 2
+    dst = _local_dst(server)
+    dst.get_subjects()
+    dst.get_subjects()
+    assert len(server.paths) == 1
+    dst.clear_cache()
+    dst.get_subjects()
+    assert len(server.paths) == 2
+
+# Check that only the most recently used JSON responses are kept in memory
+def test_memory_cache_evicts_least_recently_used(server, monkeypatch):
+    monkeypatch.setattr(pydst, '_JSON_CACHE_SIZE', 1)
+    server.responses = [_json_response(_SUBJECTS)] * 3
+    dst = _local_dst(server)
+    dst.get_subjects(subjects='02')
+    dst.get_subjects(subjects='05')
+    dst.get_subjects(subjects='02')
+    assert len(server.paths) == 3
+
+# Check that an unclosed Dst is freed without the cyclic garbage collector
+def test_dst_freed_without_gc():
+    import gc
+    import weakref
+    gc.disable()
+    try:
+        ref = weakref.ref(pydst.Dst())
+        assert ref() is None
+    finally:
+        gc.enable()
+
+# Check that a large Retry-After is capped at the maximum retry wait
+def test_retry_after_is_capped(server, monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(time, 'sleep', sleeps.append)
+    server.responses = [_json_response({}, status=429,
+                                       headers={'Retry-After': '3600'}),
+                        _json_response(_SUBJECTS)]
+    _local_dst(server).get_subjects()
+    assert sleeps == [pydst._RETRY_WAIT_MAX]
+
+# Check that the jittered exponential backoff is capped at the maximum wait
+def test_retry_backoff_is_capped():
+    from urllib3.util.retry import RequestHistory
+    history = (RequestHistory('GET', '/', None, 503, None),) * 3
+    retry = pydst._Retry(total=10, backoff_factor=1.0, history=history)
+    assert 4 <= retry.get_backoff_time() <= 8
+    retry = pydst._Retry(total=10, backoff_factor=100.0, history=history)
+    assert retry.get_backoff_time() == pydst._RETRY_WAIT_MAX
+
+
+# Check that get_data_many fetches several tables through the shared session
+def test_get_data_many_fetches_tables(server):
+    for table_id, value in [('FOLK1A', '1'), ('FOLK1B', '2')]:
+        tableinfo = dict(_TABLEINFO, id=table_id)
+        server.routes['/v1/tableinfo/' + table_id] = \
+            _json_response(tableinfo)
+        server.routes['/v1/data/' + table_id] = \
+            _gzip_response('TID;INDHOLD\n2018K1;{}\n'.format(value).encode(),
+                           'text/csv')
+    with _local_dst(server) as dst:
+        res = dst.get_data_many(['FOLK1A', 'FOLK1B'], max_workers=2)
+    assert sorted(res) == ['FOLK1A', 'FOLK1B']
+    assert list(res['FOLK1A']['INDHOLD']) == [1]
+    assert list(res['FOLK1B']['INDHOLD']) == [2]
+    assert len(server.paths) == 4
+
+# Check that mutating returned metadata, variables or tables does not change
+# the cached responses
+def test_returned_objects_do_not_share_cache(server):
+    tableinfo = dict(_TABLEINFO, contacts=[{'name': 'Statbank'}])
+    server.routes['/v1/tableinfo/FOLK1A'] = _json_response(tableinfo)
+    server.routes['/v1/tables'] = _json_response(
+        [{'id': 'FOLK1A', 'updated': '2018-05-08T08:00:00',
+          'variables': ['time']}])
+    dst = _local_dst(server)
+
+    dst.get_metadata('FOLK1A')['contacts'][0]['name'] = 'changed'
+    dst.get_variables('FOLK1A')['values'][0][0]['id'] = 'changed'
+    dst.get_tables()['variables'][0].append('changed')
+
+    assert dst.get_metadata('FOLK1A')['contacts'] == [{'name': 'Statbank'}]
+    assert dst.get_variables('FOLK1A')['values'][0] == [{'id': '2018K1'}]
+    assert dst.get_tables()['variables'][0] == ['time']
+    assert len(server.paths) == 2
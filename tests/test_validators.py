@@ -20,9 +20,39 @@ def test_ValueError_if_lang_not_in_valid_langs():
     with pytest.raises(ValueError):
         validators.lang_validator('da', ['en'])
 
+def test_ValueError_if_lang_partially_letters():
+    with pytest.raises(ValueError):
+        validators.lang_validator('da123', ['da'])
+
+def test_ValueError_if_lang_trailing_newline():
+    with pytest.raises(ValueError):
+        validators.lang_validator('da\n', ['da\n'])
+
+def test_ValueError_if_subject_partially_digits():
+    with pytest.raises(ValueError):
+        validators.subject_validator('02;drop')
+
+def test_ValueError_if_subject_list_partially_digits():
+    with pytest.raises(ValueError):
+        validators.subject_validator(['02', '05a'])
+
+def test_ValueError_if_subject_validator_many_gets_invalid_subjects():
+    with pytest.raises(ValueError):
+        validators.subject_validator_many(['02', 5, '05a'])
+
+def test_subject_validator_many_returns_None_if_correctly_specified():
+    assert validators.subject_validator_many(['02', '05']) == None
+
 def test_returns_None_if_correctly_specified():
     assert validators.lang_validator('da', ['da', 'en']) == None
 
+def test_returns_None_if_valid_langs_frozenset():
+    assert validators.lang_validator('da', frozenset(['da', 'en'])) == None
+
+def test_ValueError_if_lang_not_in_valid_langs_frozenset():
+    with pytest.raises(ValueError):
+        validators.lang_validator('da', frozenset(['en']))
+
 def test_False_if_str_not_in_list():
     assert validators.str_in_list('da', ['en']) == False
 